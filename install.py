@@ -1,11 +1,17 @@
+import ctypes.util
+import hashlib
 import launch
 import os
 import shutil
+from functools import lru_cache
 from importlib import metadata
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
 from packaging.version import parse
 import subprocess
+import sysconfig
 import tempfile
 
 from internal_liveportrait.utils import IS_WINDOWS, IS_MACOS, is_valid_torch_version, get_xpose_build_commands_and_env
@@ -30,65 +36,76 @@ onnx_to_onnx_runtime_versions = {
 
 repo_root = Path(__file__).parent
 main_req_file = repo_root / "requirements.txt"
+xpose_op_root = os.path.join(repo_root, "liveportrait", "utils", "dependencies", "XPose", "models", "UniPose", "ops")
+xpose_op_lib = os.path.join(xpose_op_root, "lib")
+xpose_cache_root = repo_root / "logs" / "xpose_cache"
 
 
-def get_installed_version(package: str) -> Optional[str]:
-    try:
-        return metadata.version(package)
-    except Exception:
-        return None
+installed_versions: Dict[str, str] = {}
 
 
-def extract_base_package(package_string: str) -> str:
-    base_package = package_string.split("@git")[0]
-    return base_package
+def refresh_installed_versions():
+    """
+    Index the installed distributions by canonical name in a single pass over sys.path,
+    instead of searching for each package separately.
+    """
+    installed_versions.clear()
+    for distribution in metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name:
+            installed_versions.setdefault(canonicalize_name(name), distribution.version)
+
+
+def get_installed_version(package: str) -> Optional[str]:
+    if not installed_versions:
+        refresh_installed_versions()
+    return installed_versions.get(canonicalize_name(package))
 
 
 def install_requirements(req_file):
+    refresh_installed_versions()
+    to_install = []
     with open(req_file) as file:
         for package in file:
             try:
-                package = package.strip()
-                if "==" in package:
-                    package_name, package_version = package.split("==")
-                    installed_version = get_installed_version(package_name)
-                    if installed_version != package_version:
-                        launch.run_pip(
-                            f'install -U "{package}"',
-                            f"sd-webui-live-portrait requirement: changing {package_name} version from {installed_version} to {package_version}",
-                        )
-                elif ">=" in package:
-                    package_name, package_version = package.split(">=")
-                    installed_version = get_installed_version(package_name)
-                    if not installed_version or parse(
-                        installed_version
-                    ) < parse(package_version):
-                        launch.run_pip(
-                            f'install -U "{package}"',
-                            f"sd-webui-live-portrait requirement: changing {package_name} version from {installed_version} to {package_version}",
-                        )
-                elif "<=" in package:
-                    package_name, package_version = package.split("<=")
-                    installed_version = get_installed_version(package_name)
-                    if not installed_version or parse(
-                        installed_version
-                    ) > parse(package_version):
-                        launch.run_pip(
-                            f'install "{package_name}=={package_version}"',
-                            f"sd-webui-live-portrait requirement: changing {package_name} version from {installed_version} to {package_version}",
-                        )
-                elif not launch.is_installed(extract_base_package(package)):
-                    launch.run_pip(
-                        f'install "{package}"',
-                        f"sd-webui-live-portrait requirement: {package}",
-                    )
+                package = package.split(" #")[0].strip()
+                if not package or package.startswith("#"):
+                    continue
+                requirement = Requirement(package)
+                if requirement.marker and not requirement.marker.evaluate():
+                    continue
+                installed_version = get_installed_version(requirement.name)
+                if installed_version and (requirement.url or requirement.specifier.contains(installed_version, prereleases=True)):
+                    continue
+                if installed_version:
+                    print(f"sd-webui-live-portrait requirement: changing {requirement.name} version from {installed_version} to {requirement.specifier}")
+                to_install.append(package)
             except Exception as e:
                 print(e)
                 print(
-                    f"Warning: Failed to install {package}, some preprocessors may not work."
+                    f"Warning: Failed to check {package}, some preprocessors may not work."
                 )
 
+    if not to_install:
+        return
+
+    # A single pip invocation, so pip's startup and resolver only run once
+    quoted_packages = " ".join(f'"{package}"' for package in to_install)
+    try:
+        launch.run_pip(
+            f'install -U {quoted_packages}',
+            f"sd-webui-live-portrait requirements: {', '.join(to_install)}",
+        )
+    except Exception as e:
+        print(e)
+        print(
+            f"Warning: Failed to install {', '.join(to_install)}, some preprocessors may not work."
+        )
+    finally:
+        refresh_installed_versions()
+
 
+@lru_cache(maxsize=None)
 def get_onnxruntime_version_given_onnx_version():
     installed_onnx_version = get_installed_version("onnx")
     if installed_onnx_version:
@@ -104,6 +121,14 @@ def are_versions_similar(version_left: str, version_right: str):
     return parsed_version_left.major == parsed_version_right.major and parsed_version_left.minor == parsed_version_right.minor
 
 
+def is_cuda_available():
+    """
+    Check for an NVIDIA driver without importing torch or initializing a CUDA context.
+    """
+    cuda_library = "nvcuda" if IS_WINDOWS else "cuda"
+    return shutil.which("nvidia-smi") is not None or ctypes.util.find_library(cuda_library) is not None
+
+
 def install_onnxruntime():
     """
     Install onnxruntime or onnxruntime-gpu based on the availability of CUDA.
@@ -113,10 +138,18 @@ def install_onnxruntime():
     onnxruntime_gpu_installed_version = get_installed_version("onnxruntime-gpu")
 
     expected_onnxruntime_version = get_onnxruntime_version_given_onnx_version()
-    
+
+    if onnxruntime_installed_version or onnxruntime_gpu_installed_version:
+        if expected_onnxruntime_version is None or all(
+            are_versions_similar(installed_version, expected_onnxruntime_version)
+            for installed_version in (onnxruntime_installed_version, onnxruntime_gpu_installed_version)
+            if installed_version
+        ):
+            # Steady state: nothing to install
+            return
+
     if not onnxruntime_installed_version and not onnxruntime_gpu_installed_version:
-        import torch.cuda as cuda # torch import head to improve loading time
-        onnxruntime = 'onnxruntime-gpu' if cuda.is_available() else 'onnxruntime'
+        onnxruntime = 'onnxruntime-gpu' if is_cuda_available() else 'onnxruntime'
         onnxruntime_package = f"{onnxruntime}=={expected_onnxruntime_version}" if expected_onnxruntime_version else onnxruntime
         launch.run_pip(
             f'install {onnxruntime_package}',
@@ -139,47 +172,83 @@ def install_onnxruntime():
             )
 
 
+def get_xpose_cache_key(op_root: str) -> str:
+    """
+    Hash of the XPose OP sources, of the torch/CUDA versions and of the python ABI they are built against.
+    """
+    import torch
+    key = hashlib.sha256()
+    root = Path(op_root)
+    for source_file in sorted(root.rglob("*")):
+        relative_path = source_file.relative_to(root)
+        if not source_file.is_file() or relative_path.parts[0] in ("lib", "build") \
+            or relative_path.parts[0].endswith(".egg-info") or "__pycache__" in relative_path.parts:
+            continue
+        key.update(relative_path.as_posix().encode())
+        key.update(source_file.read_bytes())
+    key.update(torch.__version__.encode())
+    key.update(str(torch.version.cuda).encode())
+    key.update(sysconfig.get_config_var("EXT_SUFFIX").encode())
+    return key.hexdigest()
+
+
 def install_xpose():
     """
     Install XPose.
     """
-    if IS_MACOS or not is_valid_torch_version():
+    op_root = xpose_op_root
+    op_lib = xpose_op_lib
+    if os.path.exists(op_lib) and len(os.listdir(op_lib)) > 0:
+        # Already built, no need to import torch
+        return
+    # Cheap driver probe first, so that torch is only imported when XPose may actually be built
+    if IS_MACOS or not is_cuda_available() or not is_valid_torch_version():
         # XPose is incompatible with MacOS, non NVIDIA graphic cards or torch version 2.1.x
         return
-    op_root = os.path.join(repo_root, "liveportrait", "utils", "dependencies", "XPose", "models", "UniPose", "ops")
-    op_lib = os.path.join(op_root, "lib")
-    if not os.path.exists(op_lib) or len(os.listdir(op_lib)) == 0:
-        print("Installing sd-webui-live-portrait requirement: XPose", flush=True)
-        if not os.path.exists(op_lib):
-            os.makedirs(op_lib, exist_ok=True)
-        op_logs = os.path.join(repo_root, "logs")
-        if not os.path.exists(op_logs):
-            os.makedirs(op_logs, exist_ok=True)
-        log_file = os.path.join(op_logs, "xpose.log")
-        log_err_file = os.path.join(op_logs, "xpose.err.log")
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            shutil.copytree(op_root, tmpdirname, dirs_exist_ok=True)
-            with open(log_file, 'w') as log_f, open(log_err_file, 'w') as log_err_f:
-                commands, env = get_xpose_build_commands_and_env()
-                result = subprocess.run(
-                    commands,
-                    cwd=tmpdirname,
-                    env=env,
-                    errors="ignore",
-                    stdout=log_f,
-                    stderr=log_err_f
-                )
-                if result.returncode > 0:
-                    print("Building of OP file for XPose has failed. Check the log file in the extension's 'logs' folder for more information.")
-                    return
-            op_build = os.path.join(tmpdirname, "build")
-            lib_src = Path(op_build)
-            lib_dst = Path(op_lib)
-            extension = ".pyd" if IS_WINDOWS else ".so"
-            for lib_file in lib_src.rglob(f"MultiScaleDeformableAttention*{extension}"):
-                shutil.copy2(lib_file, lib_dst)
+    if not os.path.exists(op_lib):
+        os.makedirs(op_lib, exist_ok=True)
+    extension = ".pyd" if IS_WINDOWS else ".so"
+    lib_dst = Path(op_lib)
+    lib_cache = xpose_cache_root / get_xpose_cache_key(op_root)
+    # Only a library built for the running python ABI (e.g. '.cpython-310-x86_64-linux-gnu.so') can be reused
+    cached_lib_files = list(lib_cache.glob(f"MultiScaleDeformableAttention{sysconfig.get_config_var('EXT_SUFFIX')}")) if lib_cache.exists() else []
+    if cached_lib_files:
+        for lib_file in cached_lib_files:
+            shutil.copy2(lib_file, lib_dst)
+        return
+    print("Installing sd-webui-live-portrait requirement: XPose", flush=True)
+    op_logs = os.path.join(repo_root, "logs")
+    if not os.path.exists(op_logs):
+        os.makedirs(op_logs, exist_ok=True)
+    log_file = os.path.join(op_logs, "xpose.log")
+    log_err_file = os.path.join(op_logs, "xpose.err.log")
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        # Build out of tree: sources are read from op_root, build outputs go to the temporary directory
+        op_build = os.path.join(tmpdirname, "build")
+        with open(log_file, 'w') as log_f, open(log_err_file, 'w') as log_err_f:
+            commands, env = get_xpose_build_commands_and_env(op_build)
+            result = subprocess.run(
+                commands,
+                cwd=op_root,
+                env=env,
+                errors="ignore",
+                stdout=log_f,
+                stderr=log_err_f
+            )
+            if result.returncode > 0:
+                print("Building of OP file for XPose has failed. Check the log file in the extension's 'logs' folder for more information.")
+                return
+        lib_src = Path(op_build)
+        lib_files = list(lib_src.rglob(f"MultiScaleDeformableAttention*{extension}"))
+        if not lib_files:
+            print("Building of OP file for XPose has not produced any library file. Check the log file in the extension's 'logs' folder for more information.")
+            return
+        lib_cache.mkdir(parents=True, exist_ok=True)
+        for lib_file in lib_files:
+            shutil.copy2(lib_file, lib_dst)
+            shutil.copy2(lib_file, lib_cache)
 
 
 install_requirements(main_req_file)
 install_onnxruntime()
-install_xpose()
\ No newline at end of file
+install_xpose()
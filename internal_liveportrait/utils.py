@@ -40,6 +40,19 @@ def is_valid_torch_version():
     return False
 
 
+def basename(filename):
+    """Same as liveportrait.utils.helper.basename, without importing torch and the models: a/b/c.jpg -> c"""
+    filename = os.path.basename(filename)
+    pos = filename.rfind(".")
+    return filename if pos == -1 else filename[:pos]
+
+
+def load_description(fp):
+    """Same as liveportrait.utils.helper.load_description, without importing torch and the models"""
+    with open(fp, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 def has_xpose_lib():
     xpose_lib_dir = os.path.join(repo_root, "liveportrait", "utils", "dependencies", "XPose", "models", "UniPose", "ops", "lib")
     return os.path.exists(xpose_lib_dir) and len(os.listdir(xpose_lib_dir)) > 0
@@ -241,9 +254,9 @@ def _find_cuda_home() -> Optional[str]:
         return cuda_home
     
     
-def get_xpose_build_commands_and_env():
+def get_xpose_build_commands_and_env(build_dir: str):
     env = os.environ
-    commands = [sys.executable, "setup.py", "build"]
+    commands = [sys.executable, "setup.py", "build", "--build-base", build_dir]
 
     if not IS_WINDOWS:
         return commands, env
@@ -1,18 +1,20 @@
 import base64
 import datetime
+import hashlib
 import imageio.v3 as iio
 import os
 import requests
 import shutil
 import tempfile
+import threading
 from fastapi import FastAPI, Body
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import HTTPException
 import gradio as gr
 from pydantic import BaseModel
-from typing import Any, cast, Dict, List, Literal
+from typing import Any, cast, Dict, List, Literal, TYPE_CHECKING
 import cv2
 
-from liveportrait.gradio_pipeline import GradioPipeline
 from modules.api.api import verify_url
 from modules.devices import torch_gc
 from modules.shared import opts
@@ -21,20 +23,36 @@ from liveportrait.config.argument_config import ArgumentConfig
 from liveportrait.config.base_config import make_abs_path
 from liveportrait.config.crop_config import CropConfig
 from liveportrait.config.inference_config import InferenceConfig
-from liveportrait.live_portrait_pipeline import LivePortraitPipeline
-from liveportrait.live_portrait_pipeline_animal import LivePortraitPipelineAnimal
-from liveportrait.utils.helper import basename
 
 from internal_liveportrait.utils import \
     download_insightface_models, download_liveportrait_animals_models, download_liveportrait_models, download_liveportrait_landmark_model, \
-        is_valid_torch_version, IS_MACOS, has_xpose_lib
+        is_valid_torch_version, IS_MACOS, has_xpose_lib, basename
+
+if TYPE_CHECKING:
+    # Pipelines are imported on first use, so that the webui startup does not pay for them
+    from liveportrait.gradio_pipeline import GradioPipeline
+    from liveportrait.live_portrait_pipeline import LivePortraitPipeline
+    from liveportrait.live_portrait_pipeline_animal import LivePortraitPipelineAnimal
 
 
 temp_dir = make_abs_path('../../tmp')
 
-live_portrait_pipeline: LivePortraitPipeline | None = None
-live_portrait_pipeline_animal: LivePortraitPipelineAnimal | None = None
-retargeting_pipeline: GradioPipeline | None = None
+live_portrait_pipeline: "LivePortraitPipeline | None" = None
+live_portrait_pipeline_animal: "LivePortraitPipelineAnimal | None" = None
+retargeting_pipeline: "GradioPipeline | None" = None
+# Serializes pipeline (re)building and execution, so that concurrent requests share a single model load
+# and don't update the config of a pipeline that is running
+model_cache_lock = threading.RLock()
+
+def get_crop_cfg_cache_key(crop_cfg: CropConfig):
+    """
+    Crop config fields that require to rebuild the pipeline when changed.
+    The other fields are updated on the cached pipeline.
+    """
+    key = (crop_cfg.model, crop_cfg.flag_force_cpu, crop_cfg.device_id)
+    if crop_cfg.model == "facealignment":
+        key += (crop_cfg.face_alignment_detector, crop_cfg.face_alignment_detector_device, crop_cfg.face_alignment_detector_dtype)
+    return key
 
 def clear_model_cache():
     global live_portrait_pipeline, live_portrait_pipeline_animal, retargeting_pipeline
@@ -45,79 +63,70 @@ def clear_model_cache():
 
 def init_live_portrait_pipeline(inference_cfg: InferenceConfig, crop_cfg: CropConfig, use_model_cache: bool):
     global live_portrait_pipeline, live_portrait_pipeline_animal, retargeting_pipeline
-    if not use_model_cache:
-        clear_model_cache()
-        return LivePortraitPipeline(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg
-        )
-    if not live_portrait_pipeline or live_portrait_pipeline.cropper.crop_cfg.model != crop_cfg.model or \
-        live_portrait_pipeline.cropper.crop_cfg.flag_force_cpu != crop_cfg.flag_force_cpu or \
-        live_portrait_pipeline.cropper.crop_cfg.device_id != crop_cfg.device_id or \
-        (crop_cfg.model == "facealignment" and (live_portrait_pipeline.cropper.crop_cfg.face_alignment_detector != crop_cfg.face_alignment_detector \
-                                                or live_portrait_pipeline.cropper.crop_cfg.face_alignment_detector_device != crop_cfg.face_alignment_detector_device
-                                                or live_portrait_pipeline.cropper.crop_cfg.face_alignment_detector_dtype != crop_cfg.face_alignment_detector_dtype)):
-        clear_model_cache()
-        live_portrait_pipeline = LivePortraitPipeline(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg
-        )
-    else:
-        live_portrait_pipeline.cropper.update_config(crop_cfg.__dict__)
-        live_portrait_pipeline.live_portrait_wrapper.update_config(inference_cfg.__dict__)
-    return live_portrait_pipeline
+    from liveportrait.live_portrait_pipeline import LivePortraitPipeline
+    with model_cache_lock:
+        if not use_model_cache:
+            clear_model_cache()
+            return LivePortraitPipeline(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg
+            )
+        if not live_portrait_pipeline or get_crop_cfg_cache_key(live_portrait_pipeline.cropper.crop_cfg) != get_crop_cfg_cache_key(crop_cfg):
+            clear_model_cache()
+            live_portrait_pipeline = LivePortraitPipeline(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg
+            )
+        else:
+            live_portrait_pipeline.cropper.update_config(crop_cfg.__dict__)
+            live_portrait_pipeline.live_portrait_wrapper.update_config(inference_cfg.__dict__)
+        return live_portrait_pipeline
 
 
 def init_live_portrait_animal_pipeline(inference_cfg: InferenceConfig, crop_cfg: CropConfig, use_model_cache: bool):
     global live_portrait_pipeline, live_portrait_pipeline_animal, retargeting_pipeline
-    if not use_model_cache:
-        clear_model_cache()
-        return LivePortraitPipelineAnimal(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg
-        )
-    if not live_portrait_pipeline_animal or live_portrait_pipeline_animal.cropper.crop_cfg.model != crop_cfg.model or \
-        live_portrait_pipeline_animal.cropper.crop_cfg.flag_force_cpu != crop_cfg.flag_force_cpu or \
-        live_portrait_pipeline_animal.cropper.crop_cfg.device_id != crop_cfg.device_id or \
-        (crop_cfg.model == "facealignment" and (live_portrait_pipeline_animal.cropper.crop_cfg.face_alignment_detector != crop_cfg.face_alignment_detector \
-                                                or live_portrait_pipeline_animal.cropper.crop_cfg.face_alignment_detector_device != crop_cfg.face_alignment_detector_device
-                                                or live_portrait_pipeline_animal.cropper.crop_cfg.face_alignment_detector_dtype != crop_cfg.face_alignment_detector_dtype)):
-        clear_model_cache()
-        live_portrait_pipeline_animal = LivePortraitPipelineAnimal(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg
-        )
-    else:
-        live_portrait_pipeline_animal.cropper.update_config(crop_cfg.__dict__)
-        live_portrait_pipeline_animal.live_portrait_wrapper_animal.update_config(inference_cfg.__dict__)
-    return live_portrait_pipeline_animal
+    from liveportrait.live_portrait_pipeline_animal import LivePortraitPipelineAnimal
+    with model_cache_lock:
+        if not use_model_cache:
+            clear_model_cache()
+            return LivePortraitPipelineAnimal(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg
+            )
+        if not live_portrait_pipeline_animal or get_crop_cfg_cache_key(live_portrait_pipeline_animal.cropper.crop_cfg) != get_crop_cfg_cache_key(crop_cfg):
+            clear_model_cache()
+            live_portrait_pipeline_animal = LivePortraitPipelineAnimal(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg
+            )
+        else:
+            live_portrait_pipeline_animal.cropper.update_config(crop_cfg.__dict__)
+            live_portrait_pipeline_animal.live_portrait_wrapper_animal.update_config(inference_cfg.__dict__)
+        return live_portrait_pipeline_animal
 
 
 def init_retargeting_pipeline(inference_cfg: InferenceConfig, crop_cfg: CropConfig, argument_cfg: ArgumentConfig, use_model_cache: bool):
     global live_portrait_pipeline, live_portrait_pipeline_animal, retargeting_pipeline
-    if not use_model_cache:
-        clear_model_cache()
-        return GradioPipeline(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg,
-            args=argument_cfg
-        )
-    if not retargeting_pipeline or retargeting_pipeline.cropper.crop_cfg.model != crop_cfg.model or \
-        retargeting_pipeline.cropper.crop_cfg.flag_force_cpu != crop_cfg.flag_force_cpu or \
-        retargeting_pipeline.cropper.crop_cfg.device_id != crop_cfg.device_id or \
-        (crop_cfg.model == "facealignment" and (retargeting_pipeline.cropper.crop_cfg.face_alignment_detector != crop_cfg.face_alignment_detector \
-                                                or retargeting_pipeline.cropper.crop_cfg.face_alignment_detector_device != crop_cfg.face_alignment_detector_device
-                                                or retargeting_pipeline.cropper.crop_cfg.face_alignment_detector_dtype != crop_cfg.face_alignment_detector_dtype)):
-        clear_model_cache()
-        retargeting_pipeline = GradioPipeline(
-            inference_cfg=inference_cfg,
-            crop_cfg=crop_cfg,
-            args=argument_cfg
-        )
-    else:
-        retargeting_pipeline.cropper.update_config(crop_cfg.__dict__)
-        retargeting_pipeline.live_portrait_wrapper.update_config(inference_cfg.__dict__)
-    return retargeting_pipeline
+    from liveportrait.gradio_pipeline import GradioPipeline
+    with model_cache_lock:
+        if not use_model_cache:
+            clear_model_cache()
+            return GradioPipeline(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg,
+                args=argument_cfg
+            )
+        if not retargeting_pipeline or get_crop_cfg_cache_key(retargeting_pipeline.cropper.crop_cfg) != get_crop_cfg_cache_key(crop_cfg):
+            clear_model_cache()
+            retargeting_pipeline = GradioPipeline(
+                inference_cfg=inference_cfg,
+                crop_cfg=crop_cfg,
+                args=argument_cfg
+            )
+        else:
+            retargeting_pipeline.cropper.update_config(crop_cfg.__dict__)
+            retargeting_pipeline.live_portrait_wrapper.update_config(inference_cfg.__dict__)
+        return retargeting_pipeline
 
 
 def partial_fields(target_class, kwargs):
@@ -322,7 +331,110 @@ def save_videos_and_gif_to_ouput(wfp: str, wfp_concat: str, wfp_gif: str, output
     return animated_video, animated_video_with_concat, animated_gif
 
 
+def warmup_live_portrait_pipeline():
+    """
+    Loading human inference models with the default API configuration,
+    so that they are already cached when the first request arrives.
+    """
+    try:
+        crop_cfg = initialize_crop_model(CropConfig())
+        download_liveportrait_models()
+        if crop_cfg.model == "insightface":
+            download_insightface_models()
+        init_live_portrait_pipeline(InferenceConfig(), crop_cfg, use_model_cache=True)
+        print("Live Portrait API models loaded")
+    except Exception as e:
+        print(f"Live Portrait API failed to load models at startup: {e}")
+
+
+output_cache_dir = os.path.join(temp_dir, 'output_cache')
+output_cache_staging_dir = os.path.join(output_cache_dir, '.staging')  # entries being written, not counted by the eviction
+output_cache_max_entries = 16
+
+
+def get_output_cache_key(pipeline_kind: Literal['human', 'animal'], argument_cfg: ArgumentConfig, inference_cfg: InferenceConfig, crop_cfg: CropConfig):
+    """
+    Hash of the pipeline kind, of the source and driving inputs and of the configuration parameters,
+    which fully determine the pipeline outputs.
+    """
+    key = hashlib.sha256()
+    key.update(pipeline_kind.encode())
+    for input_file in (argument_cfg.source, argument_cfg.driving):
+        with open(input_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                key.update(chunk)
+    for cfg in (argument_cfg, inference_cfg, crop_cfg):
+        params = {k: v for k, v in vars(cfg).items()
+                  if k not in ('source', 'driving', 'output_dir') and isinstance(v, (str, int, float, bool, tuple, type(None)))}
+        key.update(repr(sorted(params.items())).encode())
+    return key.hexdigest()
+
+
+def load_cached_outputs(cache_key: str, output_dir: str, names_to_cache_names: Dict[str, str]):
+    """
+    Copy the cached outputs of a previous identical request to output_dir.
+    Returns the output paths in the order they were cached, or None if not cached.
+    """
+    cache_entry = os.path.join(output_cache_dir, cache_key)
+    if not os.path.isdir(cache_entry):
+        return None
+    outputs = []
+    try:
+        os.utime(cache_entry)
+        for cached_file in sorted(os.listdir(cache_entry), key=lambda cached_file: int(cached_file.split('-', 1)[0])):
+            output_name = cached_file.split('-', 1)[1]
+            for name, cache_name in names_to_cache_names.items():
+                output_name = output_name.replace(cache_name, name)
+            output_path = os.path.join(output_dir, output_name)
+            outputs.append(output_path)
+            shutil.copyfile(os.path.join(cache_entry, cached_file), output_path)
+    except OSError:
+        # Entry evicted by a concurrent request while being read: fall back to running the pipeline
+        for output_path in outputs:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        return None
+    return outputs
+
+
+def save_outputs_to_cache(cache_key: str, outputs: List[str], names_to_cache_names: Dict[str, str]):
+    """
+    Store the outputs of a request, evicting the least recently used entries above output_cache_max_entries.
+    """
+    os.makedirs(output_cache_staging_dir, exist_ok=True)
+    cache_entry = os.path.join(output_cache_dir, cache_key)
+    if os.path.isdir(cache_entry):
+        return
+    tmp_cache_entry = tempfile.mkdtemp(dir=output_cache_staging_dir)
+    try:
+        for index, output in enumerate(outputs):
+            cache_name = os.path.basename(output)
+            for name, cache_name_placeholder in names_to_cache_names.items():
+                cache_name = cache_name.replace(name, cache_name_placeholder)
+            shutil.copyfile(output, os.path.join(tmp_cache_entry, f"{index}-{cache_name}"))
+        # Atomically publish the entry, so that concurrent requests never read a partial one
+        os.rename(tmp_cache_entry, cache_entry)
+    except OSError:
+        shutil.rmtree(tmp_cache_entry, ignore_errors=True)
+        return
+
+    cache_entries = []
+    for entry in os.listdir(output_cache_dir):
+        entry_path = os.path.join(output_cache_dir, entry)
+        if entry_path == output_cache_staging_dir or not os.path.isdir(entry_path):
+            continue
+        try:
+            cache_entries.append((os.path.getmtime(entry_path), entry_path))
+        except OSError:
+            # Already evicted by a concurrent request
+            continue
+    for _, entry_path in sorted(cache_entries, reverse=True)[output_cache_max_entries:]:
+        shutil.rmtree(entry_path, ignore_errors=True)
+
+
 def live_portrait_api(_: gr.Blocks, app: FastAPI):
+    if opts.data.get("live_portrait_api_warmup", False):
+        threading.Thread(target=warmup_live_portrait_pipeline, daemon=True).start()
     
     class LivePortraitRequest(BaseModel):
         source: str = ""  # path to the source portrait (human/animal) or video (human) or base64 encoded one
@@ -335,6 +447,7 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
         send_output: bool = True
         save_output: bool = False
         use_model_cache: bool = True
+        use_output_cache: bool = False  # whether to reuse the outputs of a previous request with same inputs and parameters
 
         ########## inference arguments ##########
         flag_use_half_precision: bool = True  # whether to use half precision (FP16). If black boxes appear, it might be due to GPU incompatibility; set to False.
@@ -404,8 +517,8 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
             source_file_extension = get_input_extension(payload.source, payload.source_file_extension)
             driving_file_extension = get_input_extension(payload.driving, payload.driving_file_extension)
             
-            argument_cfg.source = save_input_to_temp_file(payload.source, source_file_extension, tmpdirname)
-            argument_cfg.driving = save_input_to_temp_file(payload.driving, driving_file_extension, tmpdirname)
+            argument_cfg.source = await run_in_threadpool(save_input_to_temp_file, payload.source, source_file_extension, tmpdirname)
+            argument_cfg.driving = await run_in_threadpool(save_input_to_temp_file, payload.driving, driving_file_extension, tmpdirname)
 
             source_tmp_name = basename(argument_cfg.source)
             driving_tmp_name = basename(argument_cfg.driving)
@@ -424,17 +537,28 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
                 payload.face_alignment_detector_dtype
             )
             
-            download_liveportrait_models()
-            if crop_cfg.model == "insightface":
-                download_insightface_models()
-
-            live_portrait_pipeline = init_live_portrait_pipeline(
-                inference_cfg,
-                crop_cfg,
-                payload.use_model_cache
-            )
-
-            wfp, wfp_concat = live_portrait_pipeline.execute(argument_cfg)
+            def execute_live_portrait_pipeline():
+                download_liveportrait_models()
+                if crop_cfg.model == "insightface":
+                    download_insightface_models()
+                with model_cache_lock:
+                    live_portrait_pipeline = init_live_portrait_pipeline(
+                        inference_cfg,
+                        crop_cfg,
+                        payload.use_model_cache
+                    )
+                    return live_portrait_pipeline.execute(argument_cfg)
+
+            names_to_cache_names = {source_tmp_name: "__source__", driving_tmp_name: "__driving__"}
+            output_cache_key = await run_in_threadpool(get_output_cache_key, 'human', argument_cfg, inference_cfg, crop_cfg) if payload.use_output_cache else None
+            cached_outputs = await run_in_threadpool(load_cached_outputs, output_cache_key, temp_output_dir, names_to_cache_names) if output_cache_key else None
+            if cached_outputs:
+                print("Live Portrait API /live-portrait/human using cached outputs")
+                wfp, wfp_concat = cached_outputs
+            else:
+                wfp, wfp_concat = await run_in_threadpool(execute_live_portrait_pipeline)
+                if output_cache_key:
+                    await run_in_threadpool(save_outputs_to_cache, output_cache_key, [wfp, wfp_concat], names_to_cache_names)
             wfp, wfp_concat = rename_output_videos(wfp, wfp_concat, temp_output_dir, new_names_to_old_names)
 
             if payload.output_mode == "images":
@@ -538,7 +662,7 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
 
             source_file_extension = get_input_extension(payload.source, payload.source_file_extension)
 
-            argument_cfg.source = save_input_to_temp_file(payload.source, source_file_extension, tmpdirname)
+            argument_cfg.source = await run_in_threadpool(save_input_to_temp_file, payload.source, source_file_extension, tmpdirname)
 
             argument_cfg.output_dir = temp_output_dir
 
@@ -550,46 +674,50 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
                 payload.face_alignment_detector_dtype
             )
             
-            download_liveportrait_models()
-            if crop_cfg.model == "insightface":
-                download_insightface_models()
-
-            retargeting_pipeline = init_retargeting_pipeline(
-                inference_cfg,
-                crop_cfg,
-                argument_cfg,
-                payload.use_model_cache
-            )
+            def execute_retargeting_pipeline():
+                download_liveportrait_models()
+                if crop_cfg.model == "insightface":
+                    download_insightface_models()
+                with model_cache_lock:
+                    retargeting_pipeline = init_retargeting_pipeline(
+                        inference_cfg,
+                        crop_cfg,
+                        argument_cfg,
+                        payload.use_model_cache
+                    )
+                    return [
+                        retargeting_pipeline.execute_image_retargeting(
+                            retargeting_option.eye_ratio,
+                            retargeting_option.lip_ratio,
+                            retargeting_option.head_pitch_variation,
+                            retargeting_option.head_yaw_variation,
+                            retargeting_option.head_roll_variation,
+                            retargeting_option.mov_x,
+                            retargeting_option.mov_y,
+                            retargeting_option.mov_z,
+                            retargeting_option.lip_variation_pouting,
+                            retargeting_option.lip_variation_pursing,
+                            retargeting_option.lip_variation_grin,
+                            retargeting_option.lip_variation_opening,
+                            retargeting_option.smile,
+                            retargeting_option.wink,
+                            retargeting_option.eyebrow,
+                            retargeting_option.eyeball_direction_x,
+                            retargeting_option.eyeball_direction_y,
+                            argument_cfg.source,
+                            payload.source_face_index,
+                            payload.retargeting_source_scale,
+                            payload.flag_stitching_retargeting_input,
+                            payload.flag_do_crop_input_retargeting_image
+                        )
+                        for retargeting_option in payload.retargeting_options
+                    ]
+
+            retargeting_outputs = await run_in_threadpool(execute_retargeting_pipeline)
 
             retargeting_images = []
             retargeting_images_cropped = []
-            for option_index in range(len(payload.retargeting_options)):
-                retargeting_option = payload.retargeting_options[option_index]
-                out, out_to_ori_blend = retargeting_pipeline.execute_image_retargeting(
-                    retargeting_option.eye_ratio,
-                    retargeting_option.lip_ratio,
-                    retargeting_option.head_pitch_variation,
-                    retargeting_option.head_yaw_variation,
-                    retargeting_option.head_roll_variation,
-                    retargeting_option.mov_x,
-                    retargeting_option.mov_y,
-                    retargeting_option.mov_z,
-                    retargeting_option.lip_variation_pouting,
-                    retargeting_option.lip_variation_pursing,
-                    retargeting_option.lip_variation_grin,
-                    retargeting_option.lip_variation_opening,
-                    retargeting_option.smile,
-                    retargeting_option.wink,
-                    retargeting_option.eyebrow,
-                    retargeting_option.eyeball_direction_x,
-                    retargeting_option.eyeball_direction_y,
-                    argument_cfg.source,
-                    payload.source_face_index,
-                    payload.retargeting_source_scale,
-                    payload.flag_stitching_retargeting_input,
-                    payload.flag_do_crop_input_retargeting_image
-                )
-
+            for option_index, (out, out_to_ori_blend) in enumerate(retargeting_outputs):
                 suffix = "" if len(payload.retargeting_options) == 1 else f"_{option_index}"
 
                 source_file_name = basename(payload.source) if is_file(payload.source) else "source"
@@ -638,7 +766,7 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
         with tempfile.TemporaryDirectory(dir=temp_dir) as tmpdirname:
             source_file_extension = get_input_extension(payload.source, payload.source_file_extension)
 
-            argument_cfg.source = save_input_to_temp_file(payload.source, source_file_extension, tmpdirname)
+            argument_cfg.source = await run_in_threadpool(save_input_to_temp_file, payload.source, source_file_extension, tmpdirname)
 
             initialize_crop_model(
                 crop_cfg,
@@ -648,24 +776,26 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
                 payload.face_alignment_detector_dtype
             )
             
-            download_liveportrait_models()
-            if crop_cfg.model == "insightface":
-                download_insightface_models()
-
-            retargeting_pipeline = init_retargeting_pipeline(
-                inference_cfg,
-                crop_cfg,
-                argument_cfg,
-                payload.use_model_cache
-            )
-
-            source_eye_ratio, source_lip_ratio = retargeting_pipeline.init_retargeting_image(
-                payload.source_face_index,
-                payload.retargeting_source_scale,
-                payload.eye_ratio,
-                payload.lip_ratio,
-                argument_cfg.source
-            )
+            def init_retargeting_image():
+                download_liveportrait_models()
+                if crop_cfg.model == "insightface":
+                    download_insightface_models()
+                with model_cache_lock:
+                    retargeting_pipeline = init_retargeting_pipeline(
+                        inference_cfg,
+                        crop_cfg,
+                        argument_cfg,
+                        payload.use_model_cache
+                    )
+                    return retargeting_pipeline.init_retargeting_image(
+                        payload.source_face_index,
+                        payload.retargeting_source_scale,
+                        payload.eye_ratio,
+                        payload.lip_ratio,
+                        argument_cfg.source
+                    )
+
+            source_eye_ratio, source_lip_ratio = await run_in_threadpool(init_retargeting_image)
 
             print("Live Portrait API /live-portrait/human/retargeting/image/init finished")
 
@@ -703,7 +833,7 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
 
             source_file_extension = get_input_extension(payload.source, payload.source_file_extension)
 
-            argument_cfg.source = save_input_to_temp_file(payload.source, source_file_extension, tmpdirname)
+            argument_cfg.source = await run_in_threadpool(save_input_to_temp_file, payload.source, source_file_extension, tmpdirname)
 
             source_tmp_name = basename(argument_cfg.source)
             new_names_to_old_names = {
@@ -720,26 +850,28 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
                 payload.face_alignment_detector_dtype
             )
             
-            download_liveportrait_models()
-            if crop_cfg.model == "insightface":
-                download_insightface_models()
-
-            retargeting_pipeline = init_retargeting_pipeline(
-                inference_cfg,
-                crop_cfg,
-                argument_cfg,
-                payload.use_model_cache
-            )
-
-            wfp_concat, wfp = retargeting_pipeline.execute_video_retargeting(
-                payload.lip_ratio,
-                argument_cfg.source,
-                payload.source_face_index,
-                payload.retargeting_source_scale,
-                payload.driving_smooth_observation_variance_retargeting,
-                payload.video_retargeting_silence,
-                payload.flag_do_crop_input_retargeting_video
-            )
+            def execute_video_retargeting_pipeline():
+                download_liveportrait_models()
+                if crop_cfg.model == "insightface":
+                    download_insightface_models()
+                with model_cache_lock:
+                    retargeting_pipeline = init_retargeting_pipeline(
+                        inference_cfg,
+                        crop_cfg,
+                        argument_cfg,
+                        payload.use_model_cache
+                    )
+                    return retargeting_pipeline.execute_video_retargeting(
+                        payload.lip_ratio,
+                        argument_cfg.source,
+                        payload.source_face_index,
+                        payload.retargeting_source_scale,
+                        payload.driving_smooth_observation_variance_retargeting,
+                        payload.video_retargeting_silence,
+                        payload.flag_do_crop_input_retargeting_video
+                    )
+
+            wfp_concat, wfp = await run_in_threadpool(execute_video_retargeting_pipeline)
             wfp, wfp_concat = rename_output_videos(wfp, wfp_concat, temp_output_dir, new_names_to_old_names)
 
             retargeting_video, retargeting_video_with_concat = save_videos_to_ouput(
@@ -780,8 +912,8 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
             source_file_extension = get_input_extension(payload.source, payload.source_file_extension)
             driving_file_extension = get_input_extension(payload.driving, payload.driving_file_extension)
 
-            argument_cfg.source = save_input_to_temp_file(payload.source, source_file_extension, tmpdirname)
-            argument_cfg.driving = save_input_to_temp_file(payload.driving, driving_file_extension, tmpdirname)
+            argument_cfg.source = await run_in_threadpool(save_input_to_temp_file, payload.source, source_file_extension, tmpdirname)
+            argument_cfg.driving = await run_in_threadpool(save_input_to_temp_file, payload.driving, driving_file_extension, tmpdirname)
 
             source_tmp_name = basename(argument_cfg.source)
             driving_tmp_name = basename(argument_cfg.driving)
@@ -792,17 +924,28 @@ def live_portrait_api(_: gr.Blocks, app: FastAPI):
 
             argument_cfg.output_dir = temp_output_dir
 
-            download_liveportrait_landmark_model()
-            download_liveportrait_animals_models()
-            download_insightface_models()
-
-            live_portrait_pipeline_animal = init_live_portrait_animal_pipeline(
-                inference_cfg,
-                crop_cfg,
-                payload.use_model_cache
-            )
-
-            wfp, wfp_concat, wfp_gif = live_portrait_pipeline_animal.execute(argument_cfg)
+            def execute_live_portrait_animal_pipeline():
+                download_liveportrait_landmark_model()
+                download_liveportrait_animals_models()
+                download_insightface_models()
+                with model_cache_lock:
+                    live_portrait_pipeline_animal = init_live_portrait_animal_pipeline(
+                        inference_cfg,
+                        crop_cfg,
+                        payload.use_model_cache
+                    )
+                    return live_portrait_pipeline_animal.execute(argument_cfg)
+
+            names_to_cache_names = {source_tmp_name: "__source__", driving_tmp_name: "__driving__"}
+            output_cache_key = await run_in_threadpool(get_output_cache_key, 'animal', argument_cfg, inference_cfg, crop_cfg) if payload.use_output_cache else None
+            cached_outputs = await run_in_threadpool(load_cached_outputs, output_cache_key, temp_output_dir, names_to_cache_names) if output_cache_key else None
+            if cached_outputs:
+                print("Live Portrait API /live-portrait/animal using cached outputs")
+                wfp, wfp_concat, wfp_gif = cached_outputs
+            else:
+                wfp, wfp_concat, wfp_gif = await run_in_threadpool(execute_live_portrait_animal_pipeline)
+                if output_cache_key:
+                    await run_in_threadpool(save_outputs_to_cache, output_cache_key, [wfp, wfp_concat, wfp_gif], names_to_cache_names)
             wfp, wfp_concat, wfp_gif = rename_output_videos_and_gif(wfp, wfp_concat, wfp_gif, temp_output_dir, new_names_to_old_names)
 
             if payload.output_mode == "images":
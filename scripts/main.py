@@ -2,27 +2,29 @@ import datetime
 import gradio as gr
 import os.path as osp
 from pathlib import Path
-from typing import cast, Literal
+from typing import cast, Literal, TYPE_CHECKING
 
 import modules.scripts as scripts
 from modules import devices, script_callbacks, shared
 from modules.paths_internal import data_path
 
-from liveportrait.utils.helper import load_description
 from liveportrait.config.argument_config import ArgumentConfig
 from liveportrait.config.crop_config import CropConfig
 from liveportrait.config.inference_config import InferenceConfig
-from liveportrait.gradio_pipeline import GradioPipeline, GradioPipelineAnimal
 
 from internal_liveportrait.utils import \
     download_insightface_models, download_liveportrait_animals_models, download_liveportrait_models, download_liveportrait_landmark_model, \
-    is_valid_torch_version, IS_MACOS, has_xpose_lib
+    is_valid_torch_version, IS_MACOS, has_xpose_lib, load_description
+
+if TYPE_CHECKING:
+    # Pipelines are imported on first use, so that the webui startup does not pay for them
+    from liveportrait.gradio_pipeline import GradioPipeline, GradioPipelineAnimal
 
 
 repo_root = Path(__file__).parent.parent
 
-gradio_pipeline: GradioPipeline | None = None
-gradio_pipeline_animal: GradioPipelineAnimal | None = None
+gradio_pipeline: "GradioPipeline | None" = None
+gradio_pipeline_animal: "GradioPipelineAnimal | None" = None
 
 
 class Script(scripts.Script):
@@ -93,6 +95,7 @@ def on_ui_tabs():
 
     def init_gradio_pipeline():
         global gradio_pipeline, gradio_pipeline_animal
+        from liveportrait.gradio_pipeline import GradioPipeline
 
         inference_cfg = get_inference_config()
         crop_cfg = get_crop_config()
@@ -121,6 +124,7 @@ def on_ui_tabs():
     
     def init_gradio_pipeline_animal():
         global gradio_pipeline, gradio_pipeline_animal
+        from liveportrait.gradio_pipeline import GradioPipelineAnimal
 
         inference_cfg = get_inference_config()
         crop_cfg = CropConfig()
@@ -837,6 +841,15 @@ def on_ui_settings():
         ),
     )
 
+    shared.opts.add_option(
+        "live_portrait_api_warmup",
+        shared.OptionInfo(
+            False,
+            "Load human inference models for the API at startup",
+            section=section
+        ),
+    )
+
 
 script_callbacks.on_ui_tabs(on_ui_tabs)
 script_callbacks.on_ui_settings(on_ui_settings)
\ No newline at end of file